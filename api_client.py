@@ -1,63 +1,243 @@
 import requests
+from requests.adapters import HTTPAdapter
+import sys
 import time
 import os
+import json
+import gzip
+import hashlib
+import random
 import logging
+import threading
+
+# Try to import orjson (much faster decoding of the multi-MB term-sweep payloads)
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj):
+        return json.dumps(obj).encode()
+
+CACHE_COMPRESSION_LEVEL = 3 # Fast gzip level; JSON still shrinks several-fold
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SMS_TEXTING_DIR = "/Users/isaac.cissna/Desktop/nonrepo/pythonShenanigans/smsTexting"
+
+# Resolved on the first alert: the send_message callable, or False if unavailable.
+_send_message = None
+_send_message_lock = threading.Lock()
+
+def _get_sender():
+    """Imports texting.send_message once and caches it (or the failure) for later alerts."""
+    global _send_message
+    with _send_message_lock:
+        if _send_message is None:
+            # Add the directory to sys.path temporarily
+            sys.path.insert(0, SMS_TEXTING_DIR)
+            try:
+                from texting import send_message  # type: ignore
+                _send_message = send_message
+            except Exception as e:
+                logging.error(f"SMS alerts unavailable: {e}")
+                _send_message = False
+            finally:
+                sys.path.pop(0)  # change directory back
+        return _send_message
+
+class CircuitOpenError(Exception):
+    """Raised instead of a response while the circuit breaker is open (the SIS API is down)."""
+
 class APIClient:
-    def __init__(self, requests_per_minute=100):
+    # Transient statuses worth retrying automatically before asking for help.
+    RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+
+    def __init__(self, requests_per_minute=100, burst=10, max_retries=5, backoff_base=1.0,
+                 failure_threshold=5, cache_dir=os.path.join("data", ".sis_cache"), pool_maxsize=16):
         self.requests_per_minute = requests_per_minute
-        self.last_request_time = 0
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+        # Circuit breaker: a request whose retries are spent starts a fresh round
+        # instead of prompting; after `failure_threshold` consecutive failed rounds
+        # (across all threads) the circuit opens and every call raises CircuitOpenError,
+        # so an unattended run stops instead of hanging on input().
+        # failure_threshold=None disables it and pauses for manual intervention instead.
+        self.failure_threshold = failure_threshold
+        self._fail_count = 0
+        self._circuit_open = False
+        self._circuit_lock = threading.Lock()
+
+        # Only one worker thread may prompt for a new rate at a time.
+        self._pause_lock = threading.Lock()
+
+        # Token bucket: allows short bursts of up to `burst` calls while
+        # holding the long-run rate at requests_per_minute.
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.time()
+        self._rate_lock = threading.Lock()
+
+        # A single pooled Session reuses keep-alive sockets to sis.jhu.edu,
+        # so we only pay the TCP + TLS handshake once per connection.
+        # pool_block makes extra threads wait for a pooled socket instead of
+        # opening (and then discarding) throwaway connections; size
+        # pool_maxsize to the number of threads sharing this client.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, pool_block=True, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept": "application/json", "Connection": "keep-alive"})
+
+        # On-disk response cache (set cache_dir=None to disable).
+        self.cache_dir = cache_dir
+
         self.api_key = os.environ.get("SIS_API_KEY")
         if not self.api_key:
             logging.warning("SIS_API_KEY environment variable not found.")
             # Depending on how strict we want to be, we could prompt here or fail.
             # For now, let's assume it might be set later or passed in params if needed.
 
+    def close(self):
+        """Releases the pooled connections held by the underlying Session."""
+        self.session.close()
+
     def _send_sms_alert(self, error_message):
+        send_message = _get_sender()
+        if not send_message:
+            return
         try:
-            import sys
-            # Add the directory to sys.path temporarily
-            sys.path.insert(0, "/Users/isaac.cissna/Desktop/nonrepo/pythonShenanigans/smsTexting")
-            # Import the function
-            from texting import send_message  # type: ignore
-            sys.path.pop(0)  # change directory back
-            
             send_message(f"SIS Scraper Paused: Error {error_message}")
             logging.info("SMS alert sent.")
         except Exception as e:
             logging.error(f"Failed to send SMS alert: {e}")
 
     def _wait_for_rate_limit(self):
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        wait_duration = 60.0 / self.requests_per_minute
-        
-        if time_since_last_request < wait_duration:
-            sleep_time = wait_duration - time_since_last_request
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+        # Held across the sleep so concurrent callers queue up behind each other
+        # and the global rate is respected across all worker threads.
+        with self._rate_lock:
+            now = time.time()
+            refill_rate = self.requests_per_minute / 60.0
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * refill_rate)
+            self.last_refill = now
+
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / refill_rate)
+                self.tokens = 1.0
+                self.last_refill = time.time()
 
-    def make_request(self, url, params=None, fail_silently=False):
+            self.tokens -= 1
+
+    def _backoff(self, attempt, reason):
+        """Sleeps with bounded exponential backoff plus jitter before a retry."""
+        delay = min(30, self.backoff_base * 2 ** attempt) * (1 + random.random() * 0.5)
+        logging.warning(f"Transient failure ({reason}). Retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        time.sleep(delay)
+
+    def _check_circuit(self, url):
+        if self._circuit_open:
+            raise CircuitOpenError(f"Circuit open, skipping request: {url}")
+
+    def _record_success(self):
+        with self._circuit_lock:
+            self._fail_count = 0
+
+    def _record_failure(self):
+        """Counts a failed request. Returns True if the circuit is now open."""
+        with self._circuit_lock:
+            if self._circuit_open:
+                return True
+            self._fail_count += 1
+            if self._fail_count >= self.failure_threshold:
+                self._circuit_open = True
+                logging.error(f"Circuit open after {self._fail_count} consecutive failed requests.")
+            return self._circuit_open
+
+    def _cache_key(self, url, params):
+        # Content-addressed on the URL + params, deliberately excluding the API key.
+        cache_params = {k: v for k, v in params.items() if k != 'key'}
+        key_material = url.encode() + json.dumps(cache_params, sort_keys=True).encode()
+        return hashlib.sha1(key_material).hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _read_cache(self, path):
+        """Returns the cached entry {etag, last_modified, body}, or None on a miss."""
+        try:
+            with open(path, 'rb') as f:
+                entry = _json_loads(gzip.decompress(f.read()))
+        except (OSError, EOFError, ValueError):
+            return None
+        if not isinstance(entry, dict) or "body" not in entry:
+            return None
+        return entry
+
+    def _write_cache(self, path, entry):
+        # Write to a temp file and rename so readers never see a partial entry.
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(_json_dumps(entry), compresslevel=CACHE_COMPRESSION_LEVEL))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write cache entry for {path}: {e}")
+
+    def make_request(self, url, params=None, fail_silently=False, immutable=False):
+        """
+        GETs `url` and returns the decoded JSON, or None on a fail_silently 404/500.
+        Raises CircuitOpenError while the circuit is open, so callers can tell an
+        outage apart from a query that simply has no data.
+        Pass immutable=True for responses that can never change (e.g. past terms):
+        those are served straight from the on-disk cache when present.
+        """
         if params is None:
             params = {}
+
+        cache_path = self._cache_path(self._cache_key(url, params)) if self.cache_dir else None
+        cached = self._read_cache(cache_path) if cache_path else None
+        if cached is not None and immutable:
+            return cached["body"]
+
+        # Revalidate mutable entries with a conditional GET; a 304 costs almost nothing.
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
         
         # Ensure API key is present
         if 'key' not in params and self.api_key:
             params['key'] = self.api_key
 
+        attempt = 0
         while True:
+            # Fail fast once the circuit is open, including mid-retry when another thread tripped it.
+            self._check_circuit(url)
             self._wait_for_rate_limit()
             
             try:
-                response = requests.get(url, params=params, timeout=30)
+                response = self.session.get(url, params=params, headers=headers, timeout=(5, 30))
+
+                if response.status_code == 304 and cached is not None:
+                    self._record_success()
+                    return cached["body"]
                 
                 if response.status_code == 200:
                     try:
-                        data = response.json()
+                        data = _json_loads(response.content)
+                        self._record_success()
+                        if cache_path:
+                            self._write_cache(cache_path, {
+                                "etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified"),
+                                "body": data,
+                            })
                         return data
                     except ValueError:
                         raise Exception(f"Invalid JSON response: {response.text[:100]}...")
@@ -66,7 +246,14 @@ class APIClient:
                 # These suggest a backend issue with that specific query, where fallback is appropriate.
                 if fail_silently and response.status_code in [500, 404]:
                     logging.warning(f"Request failed with {response.status_code} (fail_silently=True): {url}")
+                    self._record_success() # The server answered; this query just has no data.
                     return None
+
+                # Transient server-side trouble: back off and retry on our own first.
+                if response.status_code in self.RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    self._backoff(attempt, f"HTTP {response.status_code}")
+                    attempt += 1
+                    continue
                     
                 response.raise_for_status() # Trigger exception for other 4xx/5xx
 
@@ -74,38 +261,57 @@ class APIClient:
                 # Handle specific HTTP errors if fail_silently is enabled
                 if fail_silently and e.response is not None and e.response.status_code in [500, 404]:
                     logging.warning(f"HTTP Error caught (fail_silently=True): {e}")
+                    self._record_success()
                     return None
-                
+
                 # Otherwise, treat as a hard failure that needs intervention
-                logging.error(f"HTTP Error: {e}")
-                self._send_sms_alert(str(e))
-                self._pause_and_wait(url, str(e))
+                self._fail_request(url, "HTTP Error", e)
 
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                # Network errors should NEVER fail silently. We always want to pause and retry.
-                logging.error(f"Network error: {e}")
-                self._send_sms_alert(str(e))
-                self._pause_and_wait(url, str(e))
+                # Network errors should NEVER fail silently. Retry with backoff first,
+                # and only pause for intervention once the retry budget is spent.
+                if attempt < self.max_retries:
+                    self._backoff(attempt, e)
+                    attempt += 1
+                    continue
+                self._fail_request(url, "Network error", e)
 
             except Exception as e:
-                logging.error(f"Unexpected error: {e}")
-                self._send_sms_alert(str(e))
-                self._pause_and_wait(url, str(e))
+                self._fail_request(url, "Unexpected error", e)
+
+            # Next round (or manual intervention happened); start over with a fresh retry budget.
+            attempt = 0
+
+    def _fail_request(self, url, label, error):
+        """
+        Handles a request whose retries are spent. With the breaker enabled it only
+        counts the failure (raising CircuitOpenError once that opens the circuit) and
+        lets the caller start another round; without it, alerts and pauses for input.
+        """
+        logging.error(f"{label}: {error}")
+        if self.failure_threshold:
+            if self._record_failure():
+                self._send_sms_alert(f"circuit open after {label}: {error}")
+                raise CircuitOpenError(f"Circuit open after repeated failures: {url}") from error
+            return
+        self._send_sms_alert(str(error))
+        self._pause_and_wait(url, str(error))
 
     def _pause_and_wait(self, url, error_msg):
-        print(f"\n[!] Request failed for URL: {url}")
-        print(f"[!] Error: {error_msg}")
-        print("[!] Execution PAUSED. Enter a new requests_per_minute rate to resume (e.g., '10').")
+        with self._pause_lock:
+            print(f"\n[!] Request failed for URL: {url}")
+            print(f"[!] Error: {error_msg}")
+            print("[!] Execution PAUSED. Enter a new requests_per_minute rate to resume (e.g., '10').")
         
-        while True:
-            user_input = input("New Rate (req/min): ").strip()
-            try:
-                new_rate = int(user_input)
-                if new_rate > 0:
-                    self.requests_per_minute = new_rate
-                    logging.info(f"Resuming with rate: {self.requests_per_minute}/min")
-                    break
-                else:
-                    print("Please enter a positive integer.")
-            except ValueError:
-                print("Invalid input. Please enter an integer.")
+            while True:
+                user_input = input("New Rate (req/min): ").strip()
+                try:
+                    new_rate = int(user_input)
+                    if new_rate > 0:
+                        self.requests_per_minute = new_rate
+                        logging.info(f"Resuming with rate: {self.requests_per_minute}/min")
+                        break
+                    else:
+                        print("Please enter a positive integer.")
+                except ValueError:
+                    print("Invalid input. Please enter an integer.")
@@ -1,11 +1,14 @@
 import csv
+import functools
 import json
 import os
 import logging
+import sqlite3
 import urllib.parse
-from api_client import APIClient
+from api_client import APIClient, CircuitOpenError
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 # Try to import tqdm
 try:
@@ -15,6 +18,15 @@ except ImportError:
         print("tqdm not installed. Progress bar disabled.")
         return iterable
 
+# Try to import orjson (faster serialization of the Prereq/CoReq blobs)
+try:
+    import orjson
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    # Same compact, non-ASCII-escaped output as orjson
+    _json_dumps = functools.partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+
 # Configure Logging
 logging.basicConfig(
     filename='catalog_scrape.log',
@@ -24,73 +36,106 @@ logging.basicConfig(
 
 # Constants
 OUTPUT_FILE = os.path.join("data", "jhu_course_catalog_full.csv")
+SKELETON_DB = os.path.join("data", "skeleton.db")
+SKELETON_BATCH_SIZE = 1000 # Rows per executemany/commit during the term sweep
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+OUTPUT_FLUSH_EVERY = 50 # Courses between explicit flushes, bounding data lost on a crash
 API_BASE_URL = "https://sis.jhu.edu/api/classes"
+PHASE1_WORKERS = 8 # Concurrent term-sweep requests (the client's rate limit still applies)
+PHASE2_WORKERS = 8 # Courses resolved concurrently during detail fetching
+PHASE2_MAX_IN_FLIGHT = PHASE2_WORKERS * 2 # Submitted-but-unwritten courses held in memory
 
+@functools.lru_cache(maxsize=1)
 def generate_terms():
-    """Generates a list of terms from Fall 2010 to present."""
-    seasons = ['Intersession', "Spring", "Summer", "Fall"]
-    terms = []
+    """
+    Generates a tuple of terms from Fall 2010 to present.
+    Cached: the result only depends on today's date, which won't change meaningfully mid-run.
+    """
+    seasons = ('Intersession', "Spring", "Summer", "Fall")
     start_year = 2010
     current_date = datetime.now()
     end_year = current_date.year
     
-    for year in range(start_year, end_year + 1):
-        for season in seasons:
-            # Don't add future terms for the current year if they haven't happened/aren't listed? 
-            # Actually, usually safer to just add them all for current year.
-            terms.append(f"{season} {year}")
+    # Usually safer to just add all seasons for the current year, even future ones.
+    terms = [f"{season} {year}" for year in range(start_year, end_year + 1) for season in seasons]
             
     # Add next year's Intersession/Spring if we are late in the year
     if current_date.month >= 8:
-        terms.append(f"Intersession {end_year + 1}")
-        terms.append(f"Spring {end_year + 1}")
+        terms += [f"Intersession {end_year + 1}", f"Spring {end_year + 1}"]
         
-    return terms
+    return tuple(terms)
+
+def open_skeleton_db(path):
+    """
+    Opens a fresh on-disk store for the Term Sweep results, so Phase 2 can
+    load one course at a time instead of holding the whole catalog in memory.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("DROP TABLE IF EXISTS sections")
+    # `page` is the (term, school) page's position in the sweep. Pages finish in any
+    # order, so reads sort on it rather than on rowid to stay deterministic.
+    conn.execute("CREATE TABLE sections (page INTEGER, course_code TEXT, term TEXT, section_name TEXT, json BLOB)")
+    return conn
+
+def load_course_term_map(conn, course_code):
+    """Rebuilds Term -> [List of Section Objects] for a single course."""
+    term_map = defaultdict(list)
+    rows = conn.execute(
+        "SELECT term, json FROM sections WHERE course_code = ? ORDER BY page, rowid", (course_code,)
+    )
+    for term, section_json in rows:
+        term_map[term].append(json.loads(section_json))
+    return term_map
+
+# (CSV column, API field) pairs copied verbatim from a raw section record
+_FIELD_MAP = (
+    ("Term", "Term"),
+    ("CourseCode", "OfferingName"),
+    ("SectionName", "SectionName"),
+    ("Title", "Title"),
+    ("Instructors", "InstructorsFullName"),
+    ("Credits", "Credits"),
+    ("Status", "Status"),
+    ("Level", "Level"),
+    ("Area", "Areas"),
+    ("Building", "Building"),
+    ("Location", "Location"),
+    ("InstructionMethod", "InstructionMethod"),
+    ("MaxSeats", "MaxSeats"),
+    ("OpenSeats", "OpenSeats"),
+    ("DOW", "DOW"),         # Raw DOW
+    ("DOWSort", "DOWSort"), # Raw DOWSort
+)
 
 def process_section_row(section_data, details_map):
     """
     Transforms a raw section record into a CSV-ready row, 
     injecting Description/Prereqs from the details_map.
     """
-    term = section_data.get("Term")
-    course_name = section_data.get("OfferingName")
-    
     # Base Data
-    row = {
-        "Term": term,
-        "CourseCode": course_name,
-        "SectionName": section_data.get("SectionName", ""),
-        "Title": section_data.get("Title", ""),
-        "Instructors": section_data.get("InstructorsFullName", ""),
-        "Credits": section_data.get("Credits", ""),
-        "Status": section_data.get("Status", ""),
-        "Level": section_data.get("Level", ""),
-        "Area": section_data.get("Areas", ""),
-        "Building": section_data.get("Building", ""),
-        "Location": section_data.get("Location", ""),
-        "InstructionMethod": section_data.get("InstructionMethod", ""),
-        "MaxSeats": section_data.get("MaxSeats", ""),
-        "OpenSeats": section_data.get("OpenSeats", ""),
-        "DOW": section_data.get("DOW", ""),       # Raw DOW
-        "DOWSort": section_data.get("DOWSort", ""), # Raw DOWSort
-        "Description": "",
-        "Prereq_JSON": "[]",
-        "CoReq_JSON": "[]"
-    }
+    row = {csv_key: section_data.get(api_key, "") for csv_key, api_key in _FIELD_MAP}
+    row["Description"] = ""
+    row["Prereq_JSON"] = "[]"
+    row["CoReq_JSON"] = "[]"
 
     # Inject Details if available for this Term
+    term = row["Term"]
     if term in details_map:
         d = details_map[term]
         row["Description"] = d.get("Description", "")
-        row["Prereq_JSON"] = d.get("Prerequisites", "[]")
-        row["CoReq_JSON"] = d.get("CoRequisites", "[]")
+        # Serialized here, once per emitted row, rather than when the history is parsed
+        row["Prereq_JSON"] = _json_dumps(d.get("Prerequisites") or [])
+        row["CoReq_JSON"] = _json_dumps(d.get("CoRequisites") or [])
         
     return row
 
 def extract_details_from_history(history_data):
     """
     Parses a list of section history records (which contain SectionDetails)
-    into a map: Term -> {Description, Prerequisites, CoRequisites}
+    into a map: Term -> {Description, Prerequisites, CoRequisites}.
+    Prerequisites/CoRequisites are kept as the decoded API objects.
     """
     mapping = {}
     if not history_data:
@@ -105,19 +150,156 @@ def extract_details_from_history(history_data):
         if isinstance(details_list, list) and len(details_list) > 0:
             detail = details_list[0]
             
-            # Extract raw JSON blobs
-            prereqs = detail.get("Prerequisites", [])
-            coreqs = detail.get("CoRequisites", [])
-            
             mapping[term] = {
                 "Description": detail.get("Description", ""),
-                "Prerequisites": json.dumps(prereqs) if prereqs else "[]",
-                "CoRequisites": json.dumps(coreqs) if coreqs else "[]"
+                "Prerequisites": detail.get("Prerequisites", []),
+                "CoRequisites": detail.get("CoRequisites", [])
             }
     return mapping
 
+def resolve_course_details(client, course_code, term_map):
+    """
+    Runs the greedy Set Cover for one course: picks as few sections as possible whose
+    history covers every term in term_map, and returns Term -> {Description, Prerequisites, CoRequisites}.
+    Safe to run for several courses at once; it only touches the (thread-safe) client.
+    """
+    # A. Build the Matrix for Set Cover
+    # Map: Term -> Set(SectionNames)
+    term_to_sections = {}
+    all_terms_needed = set(term_map.keys())
+    
+    for term, section_list in term_map.items():
+        s_names = set(s.get("SectionName", "") for s in section_list)
+        term_to_sections[term] = s_names
+
+    # B. The Greedy Algorithm
+    # We need to find details for ALL terms in `all_terms_needed`.
+    # We have a map `fetched_details` that will store Term -> {Desc, Prereq}
+    fetched_details = {}
+    
+    uncovered_terms = all_terms_needed.copy()
+
+    # Inverted index: SectionName -> Set(UNCOVERED Terms offering it).
+    # Maintained incrementally as terms get covered, instead of being
+    # recounted from scratch on every pick.
+    section_to_terms = defaultdict(set)
+    for term, s_names in term_to_sections.items():
+        for s_name in s_names:
+            section_to_terms[s_name].add(term)
+
+    def resolve_term(term):
+        # Term is done (covered or given up): it no longer counts toward any section.
+        uncovered_terms.remove(term)
+        for s_name in term_to_sections[term]:
+            terms_left = section_to_terms.get(s_name)
+            if terms_left is not None:
+                terms_left.discard(term)
+                if not terms_left:
+                    del section_to_terms[s_name]
+    
+    while uncovered_terms:
+        # 1. Identify candidate sections
+        # section_to_terms already tells us which section appears in the most UNCOVERED terms
+
+        # Terminal pick: if one section is offered in EVERY remaining term, a single
+        # fetch can finish the course, so skip ranking the candidates.
+        best_section = next(
+            (s for s, terms in section_to_terms.items() if len(terms) == len(uncovered_terms)),
+            None
+        )
+        
+        if best_section is None:
+            # Priority: Single-section terms (we MUST fetch these eventually)
+            must_pick_candidates = set()
+            
+            for term in uncovered_terms:
+                available_sections = term_to_sections[term]
+                if len(available_sections) == 1:
+                    must_pick_candidates.add(next(iter(available_sections)))
+            
+            # Pick the winner
+            if must_pick_candidates:
+                # If we have terms with ONLY one section, pick one of those sections.
+                # It covers at least 1 term, maybe more.
+                # Pick the one that covers the MOST uncovered terms among the forced choices.
+                best_section = max(must_pick_candidates, key=lambda s: len(section_to_terms[s]))
+            else:
+                # Otherwise, just pick the section appearing most often
+                best_section = max(section_to_terms, key=lambda s: len(section_to_terms[s]))
+        
+        # 2. Fetch History for this Best Section
+        # GET /classes/{CourseCode}{SectionName} -> Returns history for ALL terms
+        clean_code = course_code.replace(".", "")
+        target_url = f"{API_BASE_URL}/{clean_code}{best_section}"
+        
+        logging.info(f"Fetching details for {course_code} Section {best_section} (Covers {len(section_to_terms[best_section])} terms)")
+        
+        # Try Bulk Fetch first
+        history_data = client.make_request(target_url, fail_silently=True)
+        
+        # If Bulk fails (e.g. 500 Error for too much history), Fallback to Iterative
+        if history_data is None:
+            logging.info(f"  -> Bulk fetch failed for {course_code} Sec {best_section}. Switching to iterative fetch...")
+            history_data = []
+            
+            # Identify terms this section is expected to cover. Terms that are already
+            # covered are skipped: their data would be discarded anyway.
+            expected_terms = section_to_terms[best_section]
+            terms_to_fetch = [term for term in term_to_sections if term in expected_terms]
+                    
+            # Fetch individually
+            for term in terms_to_fetch:
+                encoded_t = urllib.parse.quote(term)
+                term_url = f"{target_url}/{encoded_t}"
+                
+                term_data = client.make_request(term_url, fail_silently=True) # If this fails, truly skip
+                if term_data and isinstance(term_data, list):
+                    history_data.extend(term_data)
+        
+        # 3. Process the History
+        # Extract details for ANY term returned (even if not in our 'uncovered' set, 
+        # strictly speaking, but we mainly care about covering the set).
+        batch_details = extract_details_from_history(history_data)
+        
+        # 4. Update Coverage
+        # For every term we just got details for, remove from uncovered set
+        # AND redundancy check: if we already have details, we can compare (optional).
+        for term, details in batch_details.items():
+            if term in uncovered_terms:
+                # Only mark as covered if the fetched history actually matches a term we need
+                # AND the section we fetched actually existed in that term (it should).
+                fetched_details[term] = details
+                resolve_term(term)
+            elif term in all_terms_needed:
+                # We already covered this term, but we got data again.
+                # Redundancy check could go here.
+                pass
+        
+        # 5. Safety Valve
+        # If the API call returned NOTHING (empty history?) or didn't cover the terms we expected
+        # (e.g. the section exists in "Term Sweep" but "Section History" endpoint is broken/empty),
+        # we must remove those terms from `uncovered_terms` to prevent infinite loop,
+        # OR remove the `best_section` from consideration for those terms.
+        
+        # Logic: If `best_section` failed to provide data for a term that supposedly has `best_section`,
+        # we remove `best_section` from that term's available list.
+        # If a term runs out of available sections, we skip it (logging error).
+        
+        # Terms that SHOULD have been covered (they contain best_section) but WEREN'T
+        # are exactly the ones still listed under best_section in the index.
+        for term in section_to_terms.pop(best_section, ()):
+            # The API did not return data for this term/section combination.
+            # Remove this section from consideration for this term.
+            term_to_sections[term].remove(best_section)
+            
+            if not term_to_sections[term]:
+                logging.error(f"Failed to fetch details for {course_code} {term}. No sections left to try.")
+                resolve_term(term) # Give up on this term
+
+    return fetched_details
+
 def main():
-    client = APIClient(requests_per_minute=500)
+    client = APIClient(requests_per_minute=500, pool_maxsize=max(PHASE1_WORKERS, PHASE2_WORKERS))
     if not client.api_key:
         print("Error: SIS_API_KEY not set.")
         return
@@ -162,202 +344,159 @@ def main():
     # No, that's too big. We should process year-by-year or school-by-school.
     # But to do the "Set Cover" optimization effectively, we need the FULL picture of a Course's history.
     # Compromise: We will iterate Terms to find all Course Codes, but we will store 
-    # the "Skeleton" of the catalog in memory (grouped by CourseCode).
-    # Then we iterate Courses to fill in details.
+    # the "Skeleton" of the catalog in SQLite (indexed by CourseCode).
+    # Then we iterate Courses to fill in details, loading one course at a time.
     
     print("Phase 1: Term Sweep (Building Catalog Skeleton)...")
     
     terms = generate_terms()
+    current_year = datetime.now().year
     schools = ["Krieger School of Arts and Sciences", "Whiting School of Engineering"]
     
-    # Master structure: CourseCode -> { Term -> [List of Section Objects] }
+    # Master structure: rows of (Page, CourseCode, Term, SectionName, Section JSON)
     # This stores the "lite" data from the Term Sweep.
-    catalog_skeleton = defaultdict(lambda: defaultdict(list))
+    skeleton_db = open_skeleton_db(SKELETON_DB)
+    pending_rows = []
     
+    # Schools are fixed, so quote (and prefix) them once rather than per term.
+    school_urls = [(school, f"{API_BASE_URL}/{urllib.parse.quote(school)}") for school in schools]
+
+    jobs = []
     for term in terms:
-        logging.info(f"Scanning {term}...")
-        print(f"Scanning {term}...")
         encoded_term = urllib.parse.quote(term)
-        
-        for school in schools:
-            encoded_school = urllib.parse.quote(school)
-            url = f"{API_BASE_URL}/{encoded_school}/{encoded_term}"
-            
-            # This returns ALL sections for the school/term
-            data = client.make_request(url)
+        # Past terms never change, so they can be served from the on-disk cache.
+        immutable = int(term.split()[-1]) < current_year
+        for school, school_url in school_urls:
+            jobs.append((term, school, f"{school_url}/{encoded_term}", immutable))
+
+    # The (term, school) pages are independent, so overlap their network latency.
+    # Results are written to the skeleton DB on the main thread only.
+    with ThreadPoolExecutor(max_workers=PHASE1_WORKERS) as ex:
+        try:
+            # Each request returns ALL sections for the school/term.
+            futures = {
+                ex.submit(client.make_request, url, immutable=immutable): (page, term, school)
+                for page, (term, school, url, immutable) in enumerate(jobs)
+            }
+
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Scanning Terms", unit="page"):
+                page, term, school = futures[future]
+                logging.info(f"Scanned {term} ({school})")
+                data = future.result()
             
-            if not data or not isinstance(data, list):
-                continue
-                
-            for section in data:
-                c_code = section.get("OfferingName")
-                if not c_code:
+                if not data or not isinstance(data, list):
                     continue
                 
-                # Store this section under the Course -> Term
-                catalog_skeleton[c_code][term].append(section)
+                for section in data:
+                    c_code = section.get("OfferingName")
+                    if not c_code:
+                        continue
+                
+                    # Store this section under the Course -> Term
+                    pending_rows.append((page, c_code, term, section.get("SectionName", ""), json.dumps(section)))
+
+                if len(pending_rows) >= SKELETON_BATCH_SIZE:
+                    skeleton_db.executemany("INSERT INTO sections VALUES (?, ?, ?, ?, ?)", pending_rows)
+                    skeleton_db.commit()
+                    pending_rows = []
+        except CircuitOpenError:
+            # Drop queued pages instead of letting each one start; main() aborts.
+            ex.shutdown(cancel_futures=True)
+            raise
+
+    if pending_rows:
+        skeleton_db.executemany("INSERT INTO sections VALUES (?, ?, ?, ?, ?)", pending_rows)
+    # Index after the bulk load; it's cheaper than maintaining it per insert.
+    skeleton_db.execute("CREATE INDEX idx_sections_course ON sections (course_code)")
+    skeleton_db.commit()
 
-    print(f"Phase 1 Complete. Found {len(catalog_skeleton)} unique courses.")
+    course_codes = [r[0] for r in skeleton_db.execute("SELECT DISTINCT course_code FROM sections ORDER BY course_code")]
+    print(f"Phase 1 Complete. Found {len(course_codes)} unique courses.")
     print("Phase 2: Set Cover Optimization & Detail Fetching...")
     
     # 3. Process Each Course
-    with open(OUTPUT_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        
-        # Wrapped in tqdm for progress estimation
-        for course_code, full_term_map in tqdm(catalog_skeleton.items(), desc="Fetching Details", unit="course"):
-            
-            # Identify which terms for this course are NOT yet processed
-            missing_terms = []
-            for t in full_term_map.keys():
-                if (course_code, t) not in processed_offerings:
-                    missing_terms.append(t)
-            
-            # If we have processed ALL terms for this course, skip it entirely
-            if not missing_terms:
-                continue
-            
-            # Filter term_map to only include missing terms
-            # We assume description/prereqs from a shared section will apply to these specific missing terms.
-            # NOTE: For the Greedy Algorithm to work BEST, it ideally wants to know about ALL terms 
-            # (to find the section covering the most terms).
-            # However, for resumption efficiency, we only want to write/fetch what's missing.
-            # Compromise: We use the full `full_term_map` to calculate coverage (finding the best section),
-            # but we only WRITE rows for `missing_terms`.
-            # Actually, to save API calls, we should restrict `all_terms_needed` to just `missing_terms`.
-            # Why? Because if we already have "Fall 2023", we don't need to re-fetch its details even if
-            # it would help us "cover" "Spring 2024".
-            
-            # Construct term_map only for missing terms
-            term_map = {t: full_term_map[t] for t in missing_terms}
-            
-            # A. Build the Matrix for Set Cover
-            # Map: Term -> Set(SectionNames)
-            term_to_sections = {}
-            all_terms_needed = set(term_map.keys())
-            
-            for term, section_list in term_map.items():
-                s_names = set(s.get("SectionName", "") for s in section_list)
-                term_to_sections[term] = s_names
-
-            # B. The Greedy Algorithm
-            # We need to find details for ALL terms in `all_terms_needed`.
-            # We have a map `fetched_details` that will store Term -> {Desc, Prereq}
-            fetched_details = {}
-            
-            uncovered_terms = all_terms_needed.copy()
-            
-            while uncovered_terms:
-                # 1. Identify candidate sections
-                # Find which section name appears in the most UNCOVERED terms
-                candidate_counts = defaultdict(int)
-                
-                # Priority: Single-section terms (we MUST fetch these eventually)
-                must_pick_candidates = set()
-                
-                for term in uncovered_terms:
-                    available_sections = term_to_sections[term]
-                    if len(available_sections) == 1:
-                        must_pick_candidates.add(list(available_sections)[0])
-                    
-                    for s_name in available_sections:
-                        candidate_counts[s_name] += 1
-                
-                # Pick the winner
-                best_section = None
-                
-                if must_pick_candidates:
-                    # If we have terms with ONLY one section, pick one of those sections.
-                    # It covers at least 1 term, maybe more.
-                    # Pick the one that covers the MOST uncovered terms among the forced choices.
-                    best_section = max(must_pick_candidates, key=lambda s: candidate_counts[s])
-                else:
-                    # Otherwise, just pick the section appearing most often
-                    best_section = max(candidate_counts, key=candidate_counts.get)
-                
-                # 2. Fetch History for this Best Section
-                # GET /classes/{CourseCode}{SectionName} -> Returns history for ALL terms
-                clean_code = course_code.replace(".", "")
-                target_url = f"{API_BASE_URL}/{clean_code}{best_section}"
-                
-                logging.info(f"Fetching details for {course_code} Section {best_section} (Covers {candidate_counts[best_section]} terms)")
-                
-                # Try Bulk Fetch first
-                history_data = client.make_request(target_url, fail_silently=True)
-                
-                # If Bulk fails (e.g. 500 Error for too much history), Fallback to Iterative
-                if history_data is None:
-                    logging.info(f"  -> Bulk fetch failed for {course_code} Sec {best_section}. Switching to iterative fetch...")
-                    history_data = []
-                    
-                    # Identify terms this section is expected to cover
-                    terms_to_fetch = []
-                    for term, sections in term_to_sections.items():
-                        if best_section in sections:
-                            terms_to_fetch.append(term)
-                            
-                    # Fetch individually
-                    for term in terms_to_fetch:
-                        encoded_t = urllib.parse.quote(term)
-                        term_url = f"{target_url}/{encoded_t}"
-                        
-                        term_data = client.make_request(term_url, fail_silently=True) # If this fails, truly skip
-                        if term_data and isinstance(term_data, list):
-                            history_data.extend(term_data)
-                
-                # 3. Process the History
-                # Extract details for ANY term returned (even if not in our 'uncovered' set, 
-                # strictly speaking, but we mainly care about covering the set).
-                batch_details = extract_details_from_history(history_data)
-                
-                # 4. Update Coverage
-                # For every term we just got details for, remove from uncovered set
-                # AND redundancy check: if we already have details, we can compare (optional).
-                for term, details in batch_details.items():
-                    if term in uncovered_terms:
-                        # Only mark as covered if the fetched history actually matches a term we need
-                        # AND the section we fetched actually existed in that term (it should).
-                        fetched_details[term] = details
-                        uncovered_terms.remove(term)
-                    elif term in all_terms_needed:
-                        # We already covered this term, but we got data again.
-                        # Redundancy check could go here.
-                        pass
-                
-                # 5. Safety Valve
-                # If the API call returned NOTHING (empty history?) or didn't cover the terms we expected
-                # (e.g. the section exists in "Term Sweep" but "Section History" endpoint is broken/empty),
-                # we must remove those terms from `uncovered_terms` to prevent infinite loop,
-                # OR remove the `best_section` from consideration for those terms.
-                
-                # Logic: If `best_section` failed to provide data for a term that supposedly has `best_section`,
-                # we remove `best_section` from that term's available list.
-                # If a term runs out of available sections, we skip it (logging error).
-                
-                covered_in_this_pass = set(batch_details.keys())
-                
-                # Check for terms that SHOULD have been covered (they contain best_section) but WEREN'T
-                for term in list(uncovered_terms):
-                    if best_section in term_to_sections[term]:
-                        if term not in covered_in_this_pass:
-                            # The API did not return data for this term/section combination.
-                            # Remove this section from consideration for this term.
-                            term_to_sections[term].remove(best_section)
-                            
-                            if not term_to_sections[term]:
-                                logging.error(f"Failed to fetch details for {course_code} {term}. No sections left to try.")
-                                uncovered_terms.remove(term) # Give up on this term
-            
+    # Each course's Set Cover is serial (every pick depends on the last response), but
+    # different courses are independent, so several run at once on worker threads.
+    # Only the main thread reads the skeleton DB and writes the CSV.
+    with open(OUTPUT_FILE, 'a', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+        # Plain csv.writer + one writerows() per course avoids DictWriter's per-row overhead.
+        writer = csv.writer(f)
+        courses_written = 0
+
+        # Future -> term_map, capped at PHASE2_MAX_IN_FLIGHT so memory stays bounded
+        in_flight = {}
+
+        def write_course(future):
+            nonlocal courses_written
+            term_map = in_flight.pop(future)
+            fetched_details = future.result()
+
             # C. Write Rows
             # Now we have `fetched_details` map populated as best as possible.
             # Iterate through ALL skeleton sections and write them out.
+            rows = []
             for term, sections_list in term_map.items():
                 for section_obj in sections_list:
                     # Hydrate with details
                     row = process_section_row(section_obj, fetched_details)
-                    writer.writerow(row)
+                    rows.append([row[k] for k in fieldnames])
+            writer.writerows(rows)
+
+            courses_written += 1
+            if courses_written % OUTPUT_FLUSH_EVERY == 0:
+                f.flush()
+
+        with ThreadPoolExecutor(max_workers=PHASE2_WORKERS) as ex:
+            try:
+                # Wrapped in tqdm for progress estimation
+                for course_code in tqdm(course_codes, desc="Fetching Details", unit="course"):
+                    full_term_map = load_course_term_map(skeleton_db, course_code)
+                
+                    # Identify which terms for this course are NOT yet processed
+                    missing_terms = []
+                    for t in full_term_map.keys():
+                        if (course_code, t) not in processed_offerings:
+                            missing_terms.append(t)
+                
+                    # If we have processed ALL terms for this course, skip it entirely
+                    if not missing_terms:
+                        continue
+                
+                    # Filter term_map to only include missing terms
+                    # We assume description/prereqs from a shared section will apply to these specific missing terms.
+                    # NOTE: For the Greedy Algorithm to work BEST, it ideally wants to know about ALL terms 
+                    # (to find the section covering the most terms).
+                    # However, for resumption efficiency, we only want to write/fetch what's missing.
+                    # Compromise: We use the full `full_term_map` to calculate coverage (finding the best section),
+                    # but we only WRITE rows for `missing_terms`.
+                    # Actually, to save API calls, we should restrict `all_terms_needed` to just `missing_terms`.
+                    # Why? Because if we already have "Fall 2023", we don't need to re-fetch its details even if
+                    # it would help us "cover" "Spring 2024".
+                
+                    # Construct term_map only for missing terms
+                    term_map = {t: full_term_map[t] for t in missing_terms}
+
+                    in_flight[ex.submit(resolve_course_details, client, course_code, term_map)] = term_map
+
+                    if len(in_flight) >= PHASE2_MAX_IN_FLIGHT:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write_course(future)
+
+                for future in as_completed(list(in_flight)):
+                    write_course(future)
+            except CircuitOpenError:
+                # Unwritten courses stay out of the CSV, so a rerun resumes them.
+                ex.shutdown(cancel_futures=True)
+                raise
 
+    skeleton_db.close()
+    client.close()
     print(f"\nCatalog scrape complete. Data saved to {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    except CircuitOpenError as e:
+        # The failing course was never written, so a rerun picks it up from the resume check.
+        print(f"\nAborting: SIS API unavailable ({e}). Rerun to resume.")
\ No newline at end of file
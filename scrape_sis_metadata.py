@@ -1,12 +1,21 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
+import functools
 import time
 import os
 import logging
 import json
+import random
+import threading
 from datetime import datetime
-from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from urllib.parse import quote
+from itertools import groupby
+from operator import itemgetter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,6 +27,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# orjson parses the API payloads several times faster than the stdlib
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # TQDM for progress bar
 try:
     from tqdm import tqdm
@@ -26,10 +42,93 @@ except ImportError:
         print("tqdm not installed, showing simple progress...")
         return iterable
 
+# pyarrow (optional) adds a Parquet copy of the output next to the CSV
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 # Configuration
 API_BASE_URL = "https://sis.jhu.edu/api/classes"
 OUTPUT_FILE = os.path.join("data", "sis_metadata_enriched.csv")
+PARQUET_FILE = os.path.join("data", "sis_metadata_enriched.parquet")
+PARQUET_BATCH_ROWS = 10000 # Rows buffered per Parquet row group
 INPUT_FILE = os.path.join("data", "Course Evaluation Data.csv")
+RAW_CACHE_DIR = os.path.join("data", "raw") # Per-course API responses, reused by later runs
+RAW_CACHE_MAX_AGE = 24 * 60 * 60 # Seconds before a cached course is refetched
+OUTPUT_BUFFER_SIZE = 1 << 20
+MAX_WORKERS = 16 # Courses fetched concurrently
+MAX_IN_FLIGHT = MAX_WORKERS * 2 # Submitted-but-unwritten courses held in memory
+MAX_CONCURRENT_REQUESTS = 8 # Upper bound on simultaneous in-flight SIS calls across all workers
+MAX_RETRIES = 5 # Retries per call after an HTTP 429
+BACKOFF_BASE = 1.0 # Seconds; doubled per retry when the server gives no Retry-After
+MAX_RETRY_AFTER = 60.0 # Seconds; cap on a server-supplied Retry-After
+
+class AdaptiveLimiter:
+    """
+    Caps simultaneous SIS calls. The cap halves whenever the server answers 429
+    and grows back by one after a run of successes, so the scraper settles at
+    the real quota instead of a hard-coded sleep.
+    """
+    def __init__(self, max_limit: int, min_limit: int = 1, recover_after: int = 20):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.recover_after = recover_after
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def record_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.recover_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def record_throttled(self):
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+
+_request_slots = AdaptiveLimiter(MAX_CONCURRENT_REQUESTS)
+
+# Transient gateway errors and dropped connections are retried inside urllib3.
+# 429 is left to _get_with_backoff so the AdaptiveLimiter sees it; 500 and read
+# timeouts are not retried because fetch_course_data treats them as "bulk fetch
+# unsupported, fall back per term". These sleeps run inside session.get, i.e.
+# while holding a _request_slots slot, so Retry-After is ignored and each backoff
+# is capped (a few seconds in total).
+TRANSIENT_RETRY = Retry(
+    total=3,
+    read=0,
+    backoff_factor=1.0,
+    backoff_max=4.0,
+    respect_retry_after_header=False,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset({"GET"}),
+    raise_on_status=False, # Hand back the last response; raise_for_status() decides
+)
+
+# One pooled Session shared by every worker (urllib3's pool is thread-safe),
+# so keep-alive sockets are reused instead of a TCP + TLS handshake per call.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=TRANSIENT_RETRY))
+SESSION.headers.update({"Connection": "keep-alive"})
 
 def get_api_key() -> Optional[str]:
     """Retrieves the JHU SIS API key from environment variable."""
@@ -46,14 +145,14 @@ def load_course_codes() -> List[str]:
     """
     if os.path.exists(INPUT_FILE):
         print(f"Loading course codes from {INPUT_FILE}...")
-        unique_codes = set()
         try:
-            with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    code = row.get("course_code")
-                    if code:
-                        unique_codes.add(code.strip())
+            with open(INPUT_FILE, 'r', encoding='utf-8', newline='') as f:
+                # Plain csv.reader + a fixed column index: no per-row dict for the wide
+                # evaluation rows (the file is multi-column with quoted JSON, so it
+                # can't be split on newlines).
+                reader = csv.reader(f)
+                col = next(reader).index("course_code")
+                unique_codes = {row[col].strip() for row in reader if len(row) > col and row[col]}
                         
             print(f"Found {len(unique_codes)} unique codes.")
             return sorted(list(unique_codes))
@@ -64,15 +163,26 @@ def load_course_codes() -> List[str]:
         print(f"Warning: {INPUT_FILE} not found. Using placeholder data.")
         return ["AS.171.101", "EN.601.226", "AS.110.202"]
 
+@functools.lru_cache(maxsize=4096)
 def parse_time_to_float(time_str: str) -> Optional[float]:
     """
     Converts a time string (e.g., '13:30:00' or '1:30 PM') to a float 24h format (e.g., 13.5).
+    Cached: SIS data only uses a few hundred distinct time strings.
     """
     if not time_str:
         return None
     
     # Clean string
     time_str = time_str.strip()
+
+    # Fast path for the dominant zero-padded HH:MM:SS form, skipping strptime
+    if len(time_str) == 8 and time_str[2] == ':' and time_str[5] == ':':
+        hh, mm, ss = time_str[:2], time_str[3:5], time_str[6:]
+        digits = hh + mm + ss
+        if digits.isascii() and digits.isdigit():
+            hour, minute = int(hh), int(mm)
+            if hour < 24 and minute < 60 and int(ss) < 60:
+                return hour + minute / 60.0
     
     try:
         # Try HH:MM:SS format (common in APIs)
@@ -90,6 +200,16 @@ def parse_time_to_float(time_str: str) -> Optional[float]:
     
     return None
 
+SEASON_ORDER = {"Intersession": 0, "Spring": 1, "Summer": 2, "Fall": 3}
+
+def term_sort_key(term: str) -> Tuple[int, int]:
+    """Chronological sort key for terms like 'Fall 2021'. Unparseable terms sort first."""
+    season, _, year = term.rpartition(" ")
+    try:
+        return int(year), SEASON_ORDER.get(season, -1)
+    except ValueError:
+        return -1, -1
+
 def parse_prerequisites(prereq_data: Any) -> str:
     """
     Parses the Prerequisites field which might be a string or a list of dicts.
@@ -115,25 +235,46 @@ def parse_prerequisites(prereq_data: Any) -> str:
         
     return ""
 
-def count_set_bits(n: int) -> int:
-    """Counts the number of set bits (1s) in an integer."""
-    count = 0
-    while n > 0:
-        n &= (n - 1)
-        count += 1
-    return count
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: the server's Retry-After if usable, else exponential backoff with jitter."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            # Clamped: a huge value would park the worker, a negative one makes sleep() raise
+            return max(0.0, min(float(retry_after), MAX_RETRY_AFTER))
+        except ValueError:
+            pass # HTTP-date form; fall back to our own backoff
+    return min(30, BACKOFF_BASE * 2 ** attempt) * (1 + random.uniform(0, 0.5))
 
-def fetch_course_history(course_code: str, api_key: str) -> List[Dict[str, Any]]:
+def _get_with_backoff(session: requests.Session, url: str, params: Dict[str, Any], timeout: float) -> requests.Response:
+    """
+    GETs url through the shared concurrency limiter, retrying on HTTP 429.
+    Returns the last response; callers still decide what a non-200 means.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        with _request_slots:
+            response = session.get(url, params=params, timeout=timeout)
+        if response.status_code != 429:
+            _request_slots.record_success()
+            return response
+
+        _request_slots.record_throttled()
+        if attempt < MAX_RETRIES:
+            time.sleep(_retry_delay(response, attempt))
+    return response
+
+def fetch_course_history(course_code: str, api_key: str,
+                         session: requests.Session = SESSION) -> List[Dict[str, Any]]:
     """Queries SIS API for all historical sections of a course."""
     clean_code = course_code.replace(".", "")
     url = f"{API_BASE_URL}/{clean_code}"
     params = {"key": api_key}
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = _get_with_backoff(session, url, params, timeout=30)
         response.raise_for_status()
         
-        data = response.json()
+        data = _json_loads(response.content)
         
         # SIS API sometimes returns {"Message": "No records found"}
         if isinstance(data, dict) and "Message" in data:
@@ -144,11 +285,12 @@ def fetch_course_history(course_code: str, api_key: str) -> List[Dict[str, Any]]
     except requests.exceptions.RequestException as e:
         logging.error(f"Network error fetching {course_code}: {e}")
         return []
-    except json.JSONDecodeError as e:
+    except json.JSONDecodeError as e: # orjson.JSONDecodeError subclasses this
         logging.error(f"JSON decode error for {course_code}: {e}")
         return []
 
-def fetch_bulk_section_history(course_code: str, target_section: str, api_key: str) -> Optional[List[Dict[str, Any]]]:
+def fetch_bulk_section_history(course_code: str, target_section: str, api_key: str,
+                               session: requests.Session = SESSION) -> Optional[List[Dict[str, Any]]]:
     """
     Attempts to fetch the full history of a section (e.g. AS17110101).
     Returns None if the request fails (timeout/500), indicating a need for fallback.
@@ -158,42 +300,60 @@ def fetch_bulk_section_history(course_code: str, target_section: str, api_key: s
     params = {"key": api_key}
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = _get_with_backoff(session, url, params, timeout=30)
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
         
         # If API returns an error message dict, treat as failure
         if isinstance(data, dict) and "Message" in data:
              return None
         
         return data
-    except Exception:
-        # On ANY error (timeout, 500, json decode), return None to trigger fallback
+    except (requests.RequestException, ValueError):
+        # Timeout, 500 or bad JSON (JSONDecodeError is a ValueError): return None to trigger fallback
         return None
 
-def fetch_section_details_single_term(course_code: str, target_section: str, term: str, api_key: str) -> List[Dict[str, Any]]:
+@functools.lru_cache(maxsize=64)
+def _quote_term(term: str) -> str:
+    """URL-encodes a term name ('Fall 2023' -> 'Fall%202023'); only a few dozen distinct terms exist."""
+    return quote(term)
+
+def fetch_section_details_single_term(course_code: str, target_section: str, term: str, api_key: str,
+                                      session: requests.Session = SESSION) -> Optional[List[Dict[str, Any]]]:
     """
     Queries SIS API for a specific section in a specific term to get SectionDetails.
+    Returns [] if SIS has no record for it, or None if the call itself failed.
     """
     clean_code = course_code.replace(".", "")
-    import urllib.parse
-    encoded_term = urllib.parse.quote(term)
+    encoded_term = _quote_term(term)
     
     url = f"{API_BASE_URL}/{clean_code}{target_section}/{encoded_term}"
     params = {"key": api_key}
     
     try:
-        response = requests.get(url, params=params, timeout=10) # Shorter timeout for individual terms
+        response = _get_with_backoff(session, url, params, timeout=10) # Shorter timeout for individual terms
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
         
         if isinstance(data, dict) and "Message" in data:
              return []
         
         return data
-    except Exception as e:
+    except (requests.RequestException, ValueError) as e:
         logging.error(f"Error fetching details for {course_code} {term}: {e}")
-        return []
+        return None
+
+# Text fields aggregated as distinct values per semester
+_SET_FIELDS = ("instructors", "titles", "buildings", "locations", "areas", "instruction_methods")
+
+def join_set(values: set) -> str:
+    """Joins distinct values in sorted order (sorted() takes the set directly; no list copy)."""
+    return "; ".join(sorted(values))
+
+def _section_term_key(section: Dict[str, Any]) -> Tuple[Tuple[int, int], str]:
+    """Sorts sections chronologically; the raw term string keeps identical terms adjacent."""
+    term = section["Term"]
+    return term_sort_key(term), term
 
 def extract_features(course_code: str, 
                      course_history: List[Dict[str, Any]], 
@@ -237,37 +397,52 @@ def extract_features(course_code: str,
             "prerequisites": prereq_str
         }
 
+    # Description/prereqs are stable across terms for most courses, so terms the
+    # details fetch didn't cover fall back to the most recent term we do have.
+    default_details = details_map[max(details_map, key=term_sort_key)] if details_map else {}
+
     # 2. Group Main History by Semester
-    semesters = defaultdict(list)
-    for section in course_history:
-        term = section.get("Term")
-        if term:
-            semesters[term].append(section)
+    # SIS returns sections already clustered by term, so this sort is close to linear
+    # and groupby can walk the runs without building per-term lists. Rows come out in
+    # chronological order.
+    dated = [section for section in course_history if section.get("Term")]
+    dated.sort(key=_section_term_key)
     
     results = []
 
-    for term, sections in semesters.items():
+    # A plain loop on purpose: each call only sees one course (tens of sections), so
+    # building a DataFrame per course would cost more than the aggregation itself.
+    for term, sections in groupby(dated, key=itemgetter("Term")):
         try:
             total_enrollment = 0
             total_capacity = 0
             max_credits = 0.0
-            all_instructors = set()
             start_times = []
-            meets_friday = False
+            dow_union = 0 # Every weekday bit seen across this term's sections
             num_days = 0
-            
-            titles = set()
-            buildings = set()
-            locations = set()
-            areas = set()
-            instruction_methods = set()
             is_writing_intensive = False 
 
+            # Distinct values per text field, joined once at the end
+            aggs = {k: set() for k in _SET_FIELDS}
+            seen_sig = set() # (instr, title, building, location, areas, method) already aggregated
+
+            # Bound once per term so the inner loop does local loads, not attribute lookups
+            append_time = start_times.append
+            add_sig = seen_sig.add
+            add_instr = aggs["instructors"].add
+            add_title = aggs["titles"].add
+            add_building = aggs["buildings"].add
+            add_location = aggs["locations"].add
+            add_area = aggs["areas"].add
+            add_im = aggs["instruction_methods"].add
+
             for section in sections:
+                get = section.get
+
                 # Capacity & Enrollment
                 try:
-                    cap = int(section.get("MaxSeats", 0))
-                    open_s = int(section.get("OpenSeats", 0))
+                    cap = int(get("MaxSeats", 0))
+                    open_s = int(get("OpenSeats", 0))
                     total_capacity += cap
                     total_enrollment += (cap - open_s)
                 except (ValueError, TypeError):
@@ -275,70 +450,74 @@ def extract_features(course_code: str,
 
                 # Credits
                 try:
-                    c = float(section.get("Credits", 0))
+                    c = float(get("Credits", 0))
                     if c > max_credits:
                         max_credits = c
                 except (ValueError, TypeError):
                     pass
 
-                # Instructors
-                instr = section.get("InstructorsFullName", "")
-                if instr:
-                    all_instructors.add(instr)
-                
                 # Days checks
                 try:
-                    dow = int(section.get("DOW", 0))
-                    # Friday check (bit 16)
-                    if dow & 16:
-                        meets_friday = True
+                    dow = int(get("DOW", 0))
+                    # OR the bits together; the Friday check happens once after the loop
+                    dow_union |= dow
                     
                     # Count days (bits set)
                     # We take the max of sections? Or just the first valid one?
                     # Usually sections have same pattern. Let's take the max found.
-                    d = count_set_bits(dow)
+                    d = dow.bit_count() # Native popcount (Python 3.10+)
                     if d > num_days:
                         num_days = d
                 except (ValueError, TypeError):
                     pass
                 
                 # Earliest Start Time
-                dow_sort = section.get("DOWSort", "")
+                dow_sort = get("DOWSort", "")
                 if "^" in dow_sort:
                     time_str = dow_sort.split("^")[1]
                     t_float = parse_time_to_float(time_str)
                     if t_float is not None:
-                        start_times.append(t_float)
+                        append_time(t_float)
+
+                # Once one section is writing-intensive the term is; stop re-checking
+                if not is_writing_intensive:
+                    wi = get("IsWritingIntensive", "")
+                    if wi and wi.lower() == "yes":
+                        is_writing_intensive = True
+
+                # Instructors & New Fields
+                instr = get("InstructorsFullName", "")
+                t = get("Title", "").strip()
+                b = get("Building", "").strip()
+                loc = get("Location", "").strip()
+                a = get("Areas", "").strip()
+                im = get("InstructionMethod", "").strip()
+
+                # Sections of a term mostly repeat the same strings; one tuple lookup
+                # replaces the six set inserts when this combination was already seen.
+                sig = (instr, t, b, loc, a, im)
+                if sig in seen_sig:
+                    continue
+                add_sig(sig)
 
-                # New Fields
-                t = section.get("Title", "").strip()
+                if instr:
+                    add_instr(instr)
                 if t:
-                    titles.add(t)
-
-                wi = section.get("IsWritingIntensive", "")
-                if wi and wi.lower() == "yes":
-                    is_writing_intensive = True
-                
-                b = section.get("Building", "").strip()
+                    add_title(t)
                 if b:
-                    buildings.add(b)
-
-                loc = section.get("Location", "").strip()
+                    add_building(b)
                 if loc:
-                    locations.add(loc)
-
-                a = section.get("Areas", "").strip()
+                    add_location(loc)
                 if a and a.lower() != "none":
-                    areas.add(a)
-
-                im = section.get("InstructionMethod", "").strip()
+                    add_area(a)
                 if im:
-                    instruction_methods.add(im)
+                    add_im(im)
 
             earliest_start = min(start_times) if start_times else None
+            meets_friday = bool(dow_union & 16) # Friday check (bit 16)
             
             # Lookup details for this term
-            term_details = details_map.get(term, {})
+            term_details = details_map.get(term, default_details)
             
             row = {
                 "course_code": course_code,
@@ -349,13 +528,13 @@ def extract_features(course_code: str,
                 "max_capacity": total_capacity,
                 "actual_enrollment": total_enrollment,
                 "credits": max_credits,
-                "instructors": "; ".join(sorted(list(all_instructors))),
-                "title": "; ".join(sorted(list(titles))),
+                "instructors": join_set(aggs["instructors"]),
+                "title": join_set(aggs["titles"]),
                 "is_writing_intensive": is_writing_intensive,
-                "buildings": "; ".join(sorted(list(buildings))),
-                "locations": "; ".join(sorted(list(locations))),
-                "areas": "; ".join(sorted(list(areas))),
-                "instruction_methods": "; ".join(sorted(list(instruction_methods))),
+                "buildings": join_set(aggs["buildings"]),
+                "locations": join_set(aggs["locations"]),
+                "areas": join_set(aggs["areas"]),
+                "instruction_methods": join_set(aggs["instruction_methods"]),
                 "description": term_details.get("description", ""),
                 "prerequisites": term_details.get("prerequisites", "")
             }
@@ -367,6 +546,109 @@ def extract_features(course_code: str,
 
     return results
 
+def load_cached_course(code: str) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Returns (course_history, section_details_history) from a previous run, or None if missing/stale."""
+    path = os.path.join(RAW_CACHE_DIR, f"{code}.json")
+    try:
+        if time.time() - os.path.getmtime(path) > RAW_CACHE_MAX_AGE:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        return cached["course_history"], cached["section_details"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_cached_course(code: str, course_history: List[Dict[str, Any]],
+                       section_details_history: List[Dict[str, Any]]) -> None:
+    """Stores a course's API responses so a rerun (e.g. after a crash) can skip the network."""
+    path = os.path.join(RAW_CACHE_DIR, f"{code}.json")
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(RAW_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"course_history": course_history, "section_details": section_details_history}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error(f"Could not cache {code}: {e}")
+
+def _details_signature(records: List[Dict[str, Any]]) -> Optional[Tuple[Any, Any]]:
+    """(Description, Prerequisites) of the first record carrying SectionDetails, for change detection."""
+    for record in records:
+        sec_details = record.get("SectionDetails")
+        if isinstance(sec_details, list) and sec_details:
+            return sec_details[0].get("Description", ""), sec_details[0].get("Prerequisites", [])
+    return None
+
+def fetch_course_data(code: str, api_key: str,
+                      session: requests.Session = SESSION) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Fetches everything needed for one course: its full section history and the
+    SectionDetails history (bulk, or per term as a fallback). Runs on worker threads.
+    """
+    cached = load_cached_course(code)
+    if cached is not None:
+        return cached
+
+    # 1. Fetch Full Course History
+    course_history = fetch_course_history(code, api_key, session)
+    if not course_history:
+        # If history is empty, no need to proceed
+        return [], []
+    
+    # 2. Determine Target Section for Details
+    target_section = "01"
+    found_01 = False
+    for section in course_history:
+        if str(section.get("SectionName", "")).strip() == "01":
+            found_01 = True
+            break
+    if not found_01 and len(course_history) > 0:
+        # Fallback to the most recent section's name
+        target_section = str(course_history[-1].get("SectionName", "01"))
+
+    # 3. Try Bulk Fetch (Try 1)
+    section_details_history = fetch_bulk_section_history(code, target_section, api_key, session)
+    
+    # 4. Fallback: Iterative Fetch per Term
+    if section_details_history is None:
+        # print(f"  -> Bulk fetch failed for {code}, switching to iterative mode...")
+        section_details_history = []
+        # Get unique terms from history, newest first
+        unique_terms = sorted(set(s.get("Term") for s in course_history if s.get("Term")),
+                              key=term_sort_key, reverse=True)
+
+        # Sample the newest and oldest terms first. If their details match, the
+        # course's description is stable and extract_features can reuse it for
+        # every other term, so the per-term fan-out is skipped.
+        sample_terms = unique_terms[:1] + unique_terms[1:][-1:]
+        sampled = []
+        details_failed = False # A failed call must not be frozen into the raw cache
+        for term in sample_terms:
+            # We use the target_section (e.g. 01)
+            term_details = fetch_section_details_single_term(code, target_section, term, api_key, session)
+            if term_details is None:
+                details_failed = True
+            elif term_details:
+                section_details_history.extend(term_details)
+            sampled.append(_details_signature(term_details or []))
+
+        is_stable = len(sampled) == 2 and sampled[0] is not None and sampled[0] == sampled[1]
+        if not is_stable:
+            for term in unique_terms[1:-1]:
+                # Fetch details for this specific term
+                term_details = fetch_section_details_single_term(code, target_section, term, api_key, session)
+                if term_details is None:
+                    details_failed = True
+                elif term_details:
+                    section_details_history.extend(term_details)
+
+        if details_failed:
+            # Still usable for this run, but refetch next time instead of caching the gap.
+            return course_history, section_details_history
+
+    save_cached_course(code, course_history, section_details_history)
+    return course_history, section_details_history
+
 def main():
     api_key = get_api_key()
     if not api_key:
@@ -389,62 +671,85 @@ def main():
     ]
     
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+
+    # Optional Parquet copy, streamed in row groups so memory stays bounded.
+    # Explicit types: a batch whose start times are all None must not infer a null column.
+    parquet_writer = None
+    parquet_rows = []
+    if pa is not None:
+        parquet_schema = pa.schema([
+            ("course_code", pa.string()), ("semester", pa.string()),
+            ("start_time_24h", pa.float64()), ("is_friday", pa.bool_()),
+            ("num_days_with_class", pa.int64()), ("max_capacity", pa.int64()),
+            ("actual_enrollment", pa.int64()), ("credits", pa.float64()),
+            ("instructors", pa.string()), ("title", pa.string()),
+            ("is_writing_intensive", pa.bool_()), ("buildings", pa.string()),
+            ("locations", pa.string()), ("areas", pa.string()),
+            ("instruction_methods", pa.string()), ("description", pa.string()),
+            ("prerequisites", pa.string()),
+        ])
+        # pyarrow dictionary-encodes every column by default, which suits the
+        # description/prerequisites text repeated for each term of a course.
+        parquet_writer = pq.ParquetWriter(PARQUET_FILE, parquet_schema, compression="zstd")
+
+    def flush_parquet():
+        nonlocal parquet_writer
+        if parquet_writer is None or not parquet_rows:
+            return
+        try:
+            parquet_writer.write_table(pa.Table.from_pylist(parquet_rows, schema=parquet_schema))
+        except Exception as e:
+            # The CSV is the primary output; stop the Parquet copy rather than the run.
+            logging.error(f"Could not write {PARQUET_FILE}: {e}")
+            print(f"Error writing {PARQUET_FILE}. See log.")
+            parquet_writer.close()
+            parquet_writer = None
+        parquet_rows.clear()
     
-    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8') as csvfile:
+    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         
-        for code in tqdm(codes, desc="Fetching Metadata"):
+        # Network latency dominates, so overlap it across courses. Parsing and
+        # writing stay on the main thread (csv.DictWriter is not thread-safe).
+        # (code, future) in submission order, capped at MAX_IN_FLIGHT so memory stays
+        # bounded. Draining from the head keeps the CSV in sorted course-code order.
+        in_flight = deque()
+
+        def write_course(code, future):
             try:
-                # 1. Fetch Full Course History
-                course_history = fetch_course_history(code, api_key)
-                if not course_history:
-                    # If history is empty, no need to proceed
-                    continue
+                course_history, section_details_history = future.result()
                 
-                # 2. Determine Target Section for Details
-                target_section = "01"
-                found_01 = False
-                for section in course_history:
-                    if str(section.get("SectionName", "")).strip() == "01":
-                        found_01 = True
-                        break
-                if not found_01 and len(course_history) > 0:
-                    # Fallback to the most recent section's name
-                    target_section = str(course_history[-1].get("SectionName", "01"))
-
-                # 3. Try Bulk Fetch (Try 1)
-                section_details_history = fetch_bulk_section_history(code, target_section, api_key)
-                
-                # 4. Fallback: Iterative Fetch per Term
-                if section_details_history is None:
-                    # print(f"  -> Bulk fetch failed for {code}, switching to iterative mode...")
-                    section_details_history = []
-                    # Get unique terms from history
-                    unique_terms = set(s.get("Term") for s in course_history if s.get("Term"))
-                    
-                    for term in unique_terms:
-                        # Fetch details for this specific term
-                        # We use the target_section (e.g. 01)
-                        term_details = fetch_section_details_single_term(code, target_section, term, api_key)
-                        if term_details:
-                            section_details_history.extend(term_details)
-                        time.sleep(0.05) # Small sleep between term requests
-
                 # 5. Extract & Merge
                 rows = extract_features(code, course_history, section_details_history)
                 
-                # 6. Write
-                for row in rows:
-                    writer.writerow(row)
-                
-                # Rate limiting
-                time.sleep(0.2) 
+                # 6. Write (one batched call per course)
+                writer.writerows(rows)
+                if parquet_writer is not None:
+                    parquet_rows.extend(rows)
+                    if len(parquet_rows) >= PARQUET_BATCH_ROWS:
+                        flush_parquet()
                 
             except Exception as e:
                 logging.error(f"Unexpected error processing {code}: {e}")
                 print(f"Error processing {code}. See log.")
-                
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+            for code in tqdm(codes, desc="Fetching Metadata"):
+                in_flight.append((code, ex.submit(fetch_course_data, code, api_key, SESSION)))
+
+                # Write whatever is finished at the head; block on it only when the buffer is full.
+                while in_flight and (in_flight[0][1].done() or len(in_flight) >= MAX_IN_FLIGHT):
+                    write_course(*in_flight.popleft())
+
+            while in_flight:
+                write_course(*in_flight.popleft())
+
+    flush_parquet()
+    if parquet_writer is not None:
+        parquet_writer.close()
+        print(f"Parquet copy saved to {PARQUET_FILE}")
+
     print(f"\nDone. Results saved to {OUTPUT_FILE}")
     print("Errors (if any) logged to sis_errors.log")
 